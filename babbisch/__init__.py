@@ -2,6 +2,8 @@ from __future__ import with_statement
 
 import sys
 import os
+import time
+import resource
 
 # stolen from http://www.language-binding.net/pygccxml/example/example.py.html
 # find out the file location within the sources tree
@@ -15,12 +17,18 @@ import pygccxml.parser, pygccxml.declarations
 import os.path
 from optparse import OptionParser
 
-from babbisch.analyze import Analyzer
+from babbisch.analyze import Analyzer, JSONWriter
+from babbisch.preprocessed import PreprocessedAnalyzer
+from babbisch.filter import preprocess, filter_headers, include_exclude
 
 USAGE = 'usage: %prog [options] headerfile...'
 FORMATS = {
         'json': lambda analyzer: analyzer.to_json(indent=2)
         }
+SINKS = {
+        'json': lambda stream: JSONWriter(stream, indent=2)
+        }
+FRONTENDS = ('gccxml', 'cpp')
 
 def main():
     parser = OptionParser(usage=USAGE)
@@ -44,31 +52,113 @@ def main():
             help='add PATH to the include path',
             metavar='PATH'
             )
+    parser.add_option('--frontend',
+            action='store',
+            choices=FRONTENDS,
+            dest='frontend',
+            default='gccxml',
+            help="defines the frontend to use. 'cpp' only runs the C preprocessor "
+                 "and parses plain C declarations itself [supported: gccxml, cpp]",
+            )
+    parser.add_option('--include-header',
+            action='append',
+            dest='include_headers',
+            default=[],
+            help='only analyze headers matching REGEX [cpp frontend only, default: all]',
+            metavar='REGEX'
+            )
+    parser.add_option('--exclude-header',
+            action='append',
+            dest='exclude_headers',
+            default=[],
+            help='do not analyze headers matching REGEX [cpp frontend only]',
+            metavar='REGEX'
+            )
+    parser.add_option('--low-memory',
+            action='store_true',
+            dest='low_memory',
+            default=False,
+            help="write objects as soon as they are analyzed instead of keeping "
+                 "them all in memory. The hashes are written at the end then, "
+                 "in an entry with the tag '!Hashes'.",
+            )
+    parser.add_option('--resolve',
+            action='store_true',
+            dest='resolve',
+            default=False,
+            help="include the canonical types, sizes and alignments of all "
+                 "typedefs and function signatures",
+            )
+    parser.add_option('--profile',
+            action='store_true',
+            dest='profile',
+            default=False,
+            help="print the running time and the peak memory usage to stderr",
+            )
 
     options, args = parser.parse_args()
     if len(args) != 1:
         parser.error('You have to pass exactly one input file.')
+    if options.low_memory and options.resolve:
+        parser.error('--resolve does not work with --low-memory.')
     
-    config = pygccxml.parser.config_t(
-            gccxml_path=gccxml_09_path,
-            include_paths=options.includes,
-    )
-
-    # read and analyze source file
     filename = args[0]
     if not os.path.isfile(filename):
         parser.error("'%s' is not a valid filename" % filename)
+
+    start = time.time()
+    # in low-memory mode, objects are written while analyzing.
+    sink = stream = None
+    if options.low_memory:
+        if options.output is None:
+            stream = sys.stdout
+        else:
+            stream = open(options.output, 'w')
+        sink = SINKS[options.format](stream)
+
+    # read and analyze source file
+    if options.frontend == 'cpp':
+        include = include_exclude(
+                options.include_headers or ['.*'],
+                options.exclude_headers)
+        analyzer = PreprocessedAnalyzer(
+                filter_headers(
+                    preprocess(filename, options.includes),
+                    include,
+                    keep_markers=True),
+                sink,
+                options.resolve)
+        analyzer.analyze()
     else:
+        config = pygccxml.parser.config_t(
+                gccxml_path=gccxml_09_path,
+                include_paths=options.includes,
+        )
         decls = pygccxml.parser.parse([filename], config)
-        analyzer = Analyzer(pygccxml.declarations.get_global_namespace(decls))
+        analyzer = Analyzer(
+                pygccxml.declarations.get_global_namespace(decls),
+                sink,
+                options.resolve)
+        del decls
         analyzer.analyze()
     
     # output
-    stuff = FORMATS[options.format](analyzer)
-    if options.output is None:
-        # just print it
-        print stuff
+    if sink is not None:
+        sink.close()
+        if stream is not sys.stdout:
+            stream.close()
     else:
-        with open(options.output, 'w') as f:
-            f.write(stuff)
+        stuff = FORMATS[options.format](analyzer)
+        if options.output is None:
+            # just print it
+            print stuff
+        else:
+            with open(options.output, 'w') as f:
+                f.write(stuff)
+
+    if options.profile:
+        # ru_maxrss is in kilobytes on Linux.
+        print >> sys.stderr, 'time: %.2fs, peak RSS: %d KiB' % (
+                time.time() - start,
+                resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
 
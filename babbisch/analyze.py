@@ -1,8 +1,12 @@
 # -*- coding: utf-8 -*-
 
+import re
 import operator
+import hashlib
+import ctypes
 
 from .odict import odict
+from .tag import parse_string, translate
 
 import pygccxml.declarations
 
@@ -25,6 +29,16 @@ def format_coord(coord):
 def format_type(type, objects):
     return type
 
+def get_decl_type(decl):
+    """
+        return the type of the variable, typedef or argument *decl*.
+        pygccxml >= 1.8 renamed `type` to `decl_type`.
+    """
+    try:
+        return decl.decl_type
+    except AttributeError:
+        return decl.type
+
 class Object(object):
     def __init__(self, coord, tag):
         self.coord = coord
@@ -42,15 +56,25 @@ class Object(object):
                 'class': self.__class__.__name__
                 }
 
+    def get_references(self):
+        """
+            return a list of all type tags this object refers to.
+        """
+        return []
+
 UNNAMED_TEMPLATE = '!Unnamed%d'
 
-def _name_generator():
-    i = 1
+#: matches the names generated from `UNNAMED_TEMPLATE`.
+UNNAMED_RE = re.compile(r'!Unnamed\d+')
+
+def _name_generator(start=1):
+    i = start
     while True:
         yield UNNAMED_TEMPLATE % i
         i += 1
 
-NAME_GEN = _name_generator()
+#: names of unnamed members, numbered by their position.
+UNNAMED_MEMBER_TEMPLATE = '!Member%d'
 
 class Type(Object):
     pass
@@ -67,6 +91,9 @@ class Typedef(Object):
             })
         return state
 
+    def get_references(self):
+        return [self.target]
+
 class Array(Object):
     def __init__(self, coord, type, size=None):
         tag = 'ARRAY(%s, %s)' % (type.tag, format_tag(size))
@@ -82,6 +109,9 @@ class Array(Object):
             })
         return state
 
+    def get_references(self):
+        return [self.type.tag]
+
 class PrimitiveType(Type):
     pass
 
@@ -101,8 +131,18 @@ class Compound(Type):
             members = odict(members)
         self.members.update(members)
 
+    def get_member_name(self, name):
+        """
+            return *name*, or a generated name if the member is an
+            anonymous struct or union or an unnamed bitfield. Otherwise,
+            these would overwrite each other in `members`.
+        """
+        if not name:
+            return UNNAMED_MEMBER_TEMPLATE % len(self.members)
+        return name
+
     def add_member(self, name, type):
-        self.members[name] = type
+        self.members[self.get_member_name(name)] = type
 
     def get_state(self, objects):
         state = Type.get_state(self, objects)
@@ -114,11 +154,14 @@ class Compound(Type):
             })
         return state
 
+    def get_references(self):
+        return self.members.values()
+
 class Struct(Compound):
     modifier = 'STRUCT(%s)'
 
     def add_member(self, name, type, bitsize):
-        self.members[name] = (type, bitsize)
+        self.members[self.get_member_name(name)] = (type, bitsize)
 
     def get_state(self, objects):
         state = Type.get_state(self, objects)
@@ -130,6 +173,9 @@ class Struct(Compound):
             })
         return state
 
+    def get_references(self):
+        return [typ for typ, bitsize in self.members.itervalues()]
+
 class Enum(Compound):
     modifier = 'ENUM(%s)'
 
@@ -144,6 +190,9 @@ class Enum(Compound):
             })
         return state
 
+    def get_references(self):
+        return []
+
 class Union(Compound):
     modifier = 'UNION(%s)'
 
@@ -159,6 +208,9 @@ class Pointer(Type):
             })
         return state
 
+    def get_references(self):
+        return [self.type.tag]
+
 class Function(Object):
     def __init__(self, coord, name, rettype, arguments, varargs=False, storage=None):
         Object.__init__(self, coord, format_tag(name))
@@ -188,6 +240,9 @@ class Function(Object):
             })
         return state
 
+    def get_references(self):
+        return [self.rettype] + self.arguments.values()
+
 class FunctionType(Object):
     def __init__(self, coord, rettype, argtypes, varargs=False):
         # construct the tag
@@ -214,6 +269,9 @@ class FunctionType(Object):
             })
         return state
 
+    def get_references(self):
+        return [self.rettype] + list(self.argtypes)
+
 TYPES = ('void',
          'signed char',
          'unsigned char',
@@ -263,17 +321,332 @@ del TYPES
 del SYNONYMS
 del _get_builtins
 
+def _get_subtags(parsed):
+    """
+        yield the tag of *parsed* (a parsed tag, see `babbisch.tag`)
+        and the tags of all its arguments, recursively.
+    """
+    yield translate(parsed)
+    if isinstance(parsed, tuple):
+        for arg in parsed[1]:
+            for subtag in _get_subtags(arg):
+                yield subtag
+
+def _dump_state(obj, objects, ignore=('coord',)):
+    """
+        return the canonical state of *obj* as a JSON string,
+        without the keys in *ignore*.
+    """
+    try:
+        import simplejson as json
+    except ImportError:
+        import json
+    state = obj.get_state(objects)
+    for key in ignore:
+        del state[key]
+    return json.dumps(state, sort_keys=True)
+
+#: matches the tag of an unnamed compound.
+UNNAMED_TAG_RE = re.compile(r'^(?:STRUCT|UNION|ENUM)\((!Unnamed\d+)\)$')
+
+def _get_numbered_digest(text):
+    """
+        return a tuple ``(digest, names)``: *names* are the generated names
+        in *text*, in order of appearance. They are replaced by their index
+        before digesting, see `get_merkle_hashes`.
+    """
+    names = []
+    def number(match):
+        name = match.group(0)
+        if name not in names:
+            names.append(name)
+        return '!Unnamed#%d' % names.index(name)
+    return hashlib.sha1(UNNAMED_RE.sub(number, text)).hexdigest(), tuple(names)
+
+def get_hash_record(obj):
+    """
+        return all `get_merkle_hashes` needs to know about *obj*, as a tuple
+        ``(digest, names, anonymous, references, alias)``:
+
+        * *digest* and *names*, see `_get_numbered_digest`, of its state
+          without coordinates
+        * *anonymous*: for unnamed compounds, the same for the state
+          without name and tag, otherwise None
+        * *references*: a sorted list of all tags it refers to, compound
+          tags like ``POINTER(STRUCT(a))`` split up
+        * *alias*: for typedefs naming an unnamed compound, like
+          ``typedef struct { ... } A;``, the generated name of the compound
+    """
+    digest, names = _get_numbered_digest(_dump_state(obj, {}))
+    anonymous = alias = None
+    if isinstance(obj, Compound) and UNNAMED_RE.match(obj.name or ''):
+        anonymous = _get_numbered_digest(
+                _dump_state(obj, {}, ('coord', 'name', 'tag')))
+    elif isinstance(obj, Typedef) and obj.target is not None:
+        match = UNNAMED_TAG_RE.match(obj.target)
+        if match is not None:
+            alias = match.group(1)
+    references = set()
+    for ref in obj.get_references():
+        if ref is not None:
+            references.update(_get_subtags(parse_string(ref)))
+    return (digest, names, anonymous, sorted(references), alias)
+
+def get_merkle_hashes(records):
+    """
+        return a dictionary mapping tags to structural hashes, given
+        *records*, a dictionary mapping tags to `get_hash_record` results.
+
+        A hash does not depend on coordinates, but on the state of the
+        object and of every object it refers to, directly or indirectly.
+        Generated names of unnamed compounds are replaced by placeholders
+        that do not depend on the position of the declaration: ``!Typedef:A``
+        if the typedef A names the compound, otherwise ``!Anonymous:``
+        followed by a digest of its members.
+
+        To handle self-referencing structs, the reference graph is split
+        into strongly connected components. Each component is digested
+        once, over the digests of its objects and the hashes of the
+        components it refers to.
+    """
+    aliases = {}
+    for tag, record in records.iteritems():
+        alias = record[4]
+        if alias is not None and (alias not in aliases or tag < aliases[alias]):
+            aliases[alias] = tag
+    stable_names = {}
+    def get_stable_name(name):
+        if name not in stable_names:
+            if name in aliases:
+                stable = '!Typedef:%s' % aliases[name]
+            else:
+                stable = '!Anonymous'
+                for modifier in (Struct.modifier, Union.modifier, Enum.modifier):
+                    record = records.get(modifier % name)
+                    if record is not None and record[2] is not None:
+                        # unnamed compounds can not refer to themselves,
+                        # so this terminates.
+                        stable = '!Anonymous:%s' % get_stable_digest(*record[2])
+                        break
+            stable_names[name] = stable
+        return stable_names[name]
+    def get_stable_digest(digest, names):
+        if not names:
+            return digest
+        return hashlib.sha1(digest + ''.join(
+            ';' + get_stable_name(name) for name in names)).hexdigest()
+    def get_stable_tag(tag):
+        return UNNAMED_RE.sub(lambda match: get_stable_name(match.group(0)), tag)
+
+    # Tarjan's algorithm, iteratively. Components are found in reverse
+    # topological order, so referenced components are digested first.
+    references = dict((tag, [ref for ref in record[3] if ref in records])
+            for tag, record in records.iteritems())
+    index = {}
+    lowlink = {}
+    stack = []
+    on_stack = set()
+    component_of = {}
+    component_hashes = []
+    for root in sorted(records):
+        if root in index:
+            continue
+        work = [(root, 0)]
+        while work:
+            tag, i = work.pop()
+            if i == 0:
+                index[tag] = lowlink[tag] = len(index)
+                stack.append(tag)
+                on_stack.add(tag)
+            refs = references[tag]
+            if i > 0:
+                lowlink[tag] = min(lowlink[tag], lowlink[refs[i - 1]])
+            while i < len(refs) and refs[i] in index:
+                if refs[i] in on_stack:
+                    lowlink[tag] = min(lowlink[tag], index[refs[i]])
+                i += 1
+            if i < len(refs):
+                work.append((tag, i + 1))
+                work.append((refs[i], 0))
+                continue
+            if lowlink[tag] == index[tag]:
+                members = []
+                while True:
+                    member = stack.pop()
+                    on_stack.discard(member)
+                    component_of[member] = len(component_hashes)
+                    members.append(member)
+                    if member == tag:
+                        break
+                sha = hashlib.sha1()
+                for stable_tag, digest in sorted(
+                        (get_stable_tag(member), get_stable_digest(*records[member][:2]))
+                        for member in members):
+                    sha.update('%s=%s;' % (stable_tag, digest))
+                for component_hash in sorted(set(
+                        component_hashes[component_of[ref]]
+                        for member in members
+                        for ref in references[member]
+                        if component_of[ref] != component_of[member])):
+                    sha.update('>%s;' % component_hash)
+                component_hashes.append(sha.hexdigest())
+    return dict((tag, hashlib.sha1(
+        get_stable_digest(*record[:2])
+        + component_hashes[component_of[tag]]).hexdigest())
+        for tag, record in records.iteritems())
+
+def _layout(ctype):
+    return (ctypes.sizeof(ctype), ctypes.alignment(ctype))
+
+#: sizes and alignments of fundamental types on this platform,
+#: used to compute layouts.
+LAYOUTS = {
+        'char': _layout(ctypes.c_char),
+        'signed char': _layout(ctypes.c_byte),
+        'unsigned char': _layout(ctypes.c_ubyte),
+        'bool': _layout(ctypes.c_bool),
+        'short int': _layout(ctypes.c_short),
+        'short unsigned int': _layout(ctypes.c_ushort),
+        'int': _layout(ctypes.c_int),
+        'unsigned int': _layout(ctypes.c_uint),
+        'long int': _layout(ctypes.c_long),
+        'long unsigned int': _layout(ctypes.c_ulong),
+        'long long int': _layout(ctypes.c_longlong),
+        'long long unsigned int': _layout(ctypes.c_ulonglong),
+        'float': _layout(ctypes.c_float),
+        'double': _layout(ctypes.c_double),
+        'long double': _layout(ctypes.c_longdouble),
+        }
+
+POINTER_LAYOUT = _layout(ctypes.c_void_p)
+
+def _align(offset, alignment):
+    return (offset + alignment - 1) // alignment * alignment
+
+def get_compound_layout(members, union=False):
+    """
+        return a tuple ``(size, alignment)`` of a struct (or a union, if
+        *union* is True) with *members*, a list of
+        ``((size, alignment), bits, named)`` tuples. *bits* is None for
+        members that are no bitfields, and *named* is False for anonymous
+        members and unnamed bitfields.
+    """
+    size = offset = 0
+    alignment = 1
+    for (member_size, member_alignment), bits, named in members:
+        if named or bits is None:
+            # unnamed bitfields do not affect the alignment.
+            alignment = max(alignment, member_alignment)
+        if union:
+            size = max(size, member_size)
+        elif bits is not None:
+            # bitfields are packed into units of their type.
+            unit = member_size * 8
+            if bits == 0 or offset // unit != (offset + bits - 1) // unit:
+                offset = _align(offset, unit)
+            offset += bits
+        else:
+            offset = _align(offset, member_alignment * 8) + member_size * 8
+    if not union:
+        size = (offset + 7) // 8
+    return (_align(size, alignment), alignment)
+
 class AnalyzingError(Exception):
     pass
 
 class ImplementationError(AnalyzingError):
     pass
 
+#: the tag of the entry containing the hashes in the output of `JSONWriter`.
+HASHES_TAG = '!Hashes'
+
+class JSONWriter(object):
+    """
+        an `Analyzer` sink writing each object to *stream* as soon as
+        it is analyzed. The output has the same format as `Analyzer.to_json`,
+        but the objects have no hashes, because these depend on objects
+        that might not be analyzed yet. Instead, a compact record of each
+        object is kept (see `get_hash_record`), and the hashes of all
+        objects are written at the end, as a dictionary in an entry
+        with the tag `HASHES_TAG`.
+    """
+    def __init__(self, stream, **kwargs):
+        try:
+            import simplejson as json
+        except ImportError:
+            import json
+        self.json = json
+        self.stream = stream
+        self.kwargs = kwargs
+        self.first = True
+        self.records = {} # tag: hash record
+
+    def __call__(self, obj):
+        if self.first:
+            self.stream.write('[\n')
+            self.first = False
+        else:
+            self.stream.write(',\n')
+        self.stream.write(self.json.dumps(
+            [obj.tag, obj.get_state({})],
+            **self.kwargs))
+        self.records[obj.tag] = get_hash_record(obj)
+
+    def close(self):
+        hashes = get_merkle_hashes(self.records)
+        self.records = {}
+        self.stream.write('[\n' if self.first else ',\n')
+        self.stream.write(self.json.dumps([HASHES_TAG, hashes], **self.kwargs))
+        self.stream.write('\n]\n')
+
 class Analyzer(object):
-    def __init__(self, namespace):
+    #: number of top-level declarations analyzed at once in low-memory mode.
+    chunk_size = 1000
+
+    def __init__(self, namespace, sink=None, resolve=False):
+        """
+            If a callable *sink* is given, the analyzer runs in low-memory
+            mode: every object is passed to *sink* as soon as it is
+            analyzed instead of being stored in `objects`, and pygccxml
+            declarations are released in chunks once they are analyzed.
+
+            If *resolve* is True, the canonical types of all typedefs and
+            function signatures are precomputed after analyzing, see
+            `resolve_signatures`. That does not work in low-memory mode,
+            so a ValueError is raised if both are given.
+        """
+        if sink is not None and resolve:
+            raise ValueError('resolve does not work with a sink')
         self.namespace = namespace
+        self.sink = sink
+        self.resolve = resolve
+        self.name_gen = _name_generator()
         self.objects = odict()
         self.class_types = {} # name: union or struct
+        self.tags = set() # tags passed to the sink
+        self.resolved = {} # tag: resolved types of a typedef or function
+        self._hashes = None # tag: structural hash
+        # tag: (size, alignment) as reported by the frontend, which
+        # knows about attributes and `#pragma pack`. (None, None)
+        # if the layout is not known.
+        self.known_layouts = {}
+        self._canonical = {} # tag: parsed canonical tag
+        self._layouts = {} # tag: (size, alignment)
+        self._resolved_types = {} # tag: resolved type
+
+    def add_object(self, obj):
+        """
+            store *obj* in `objects`, or pass it to the sink. In both
+            modes, only the first object with a given tag is kept, so
+            redeclared functions are reported as first declared.
+        """
+        if self.sink is None:
+            if obj.tag not in self.objects:
+                self.objects[obj.tag] = obj
+                self._hashes = None
+        elif obj.tag not in self.tags:
+            self.tags.add(obj.tag)
+            self.sink(obj)
 
     def to_json(self, **kwargs):
         try:
@@ -282,29 +655,226 @@ class Analyzer(object):
             import json
         return json.dumps(
                 self.objects.items(),
-                default=lambda obj: obj.get_state(self.objects),
+                default=self.get_state,
                 **kwargs)
 
+    def get_state(self, obj):
+        """
+            return the state of *obj*, including its structural hash
+            and its resolved types, if they were precomputed.
+        """
+        state = obj.get_state(self.objects)
+        state['hash'] = self.get_hash(obj.tag)
+        if obj.tag in self.resolved:
+            state['resolved'] = self.resolved[obj.tag]
+        return state
+
+    def get_hash(self, tag):
+        """
+            return the structural hash of the object *tag*, see
+            `get_merkle_hashes`. The hashes of all objects are
+            computed at once.
+        """
+        if self._hashes is None:
+            self._hashes = get_merkle_hashes(dict(
+                (key, get_hash_record(obj))
+                for key, obj in self.objects.iteritems()))
+        return self._hashes[tag]
+
+    def get_canonical_type(self, tag):
+        """
+            return the canonical form of the type *tag*: all typedef
+            names, also nested ones like in ``POINTER(CONST(cairo_t))``,
+            are replaced by their targets, recursively.
+        """
+        return translate(self._canonicalize(tag))
+
+    def _canonicalize(self, tag):
+        if tag not in self._canonical:
+            parsed = parse_string(tag)
+            if isinstance(parsed, tuple):
+                kind, args = parsed
+                if kind in ('STRUCT', 'UNION', 'ENUM'):
+                    # the argument is a name, not a type.
+                    canonical = parsed
+                elif kind == 'ARRAY':
+                    canonical = (kind, (self._canonicalize(translate(args[0])), args[1]))
+                else:
+                    canonical = (kind, tuple(self._canonicalize(translate(arg))
+                        for arg in args))
+            else:
+                obj = self.objects.get(parsed)
+                if isinstance(obj, Typedef):
+                    canonical = self._canonicalize(obj.target)
+                else:
+                    canonical = parsed
+            self._canonical[tag] = canonical
+        return self._canonical[tag]
+
+    def get_layout(self, tag):
+        """
+            return a tuple ``(size, alignment)`` in bytes of the type *tag*
+            on this platform, or ``(None, None)`` if it is not known,
+            e.g. for incomplete structs, function types or types whose
+            layout is changed by attributes. Layouts in `known_layouts`
+            take precedence, also if they are hidden behind a typedef.
+        """
+        if tag not in self._layouts:
+            if tag in self.known_layouts:
+                self._layouts[tag] = self.known_layouts[tag]
+            else:
+                self._layouts[tag] = self._get_layout(parse_string(tag))
+        return self._layouts[tag]
+
+    def _get_layout(self, parsed):
+        unknown = (None, None)
+        if not isinstance(parsed, tuple):
+            obj = self.objects.get(parsed)
+            if isinstance(obj, Typedef):
+                return self.get_layout(obj.target)
+            return LAYOUTS.get(parsed, unknown)
+        kind, args = parsed
+        if kind in ('CONST', 'VOLATILE', 'RESTRICT'):
+            return self.get_layout(translate(args[0]))
+        elif kind == 'POINTER':
+            return POINTER_LAYOUT
+        elif kind == 'ENUM':
+            return LAYOUTS['int']
+        elif kind == 'ARRAY':
+            size, alignment = self.get_layout(translate(args[0]))
+            try:
+                count = int(args[1])
+            except ValueError:
+                return unknown
+            if size is None or count < 0:
+                return unknown
+            return (count * size, alignment)
+        elif kind in ('STRUCT', 'UNION'):
+            obj = self.objects.get(translate(parsed))
+            if obj is None:
+                # incomplete type
+                return unknown
+            if isinstance(obj, Struct):
+                members = [(self.get_layout(typ), bitsize, not name.startswith('!'))
+                        for name, (typ, bitsize) in obj.members.iteritems()]
+                if members:
+                    last = parse_string(obj.members.values()[-1][0])
+                    if (isinstance(last, tuple) and last[0] == 'ARRAY'
+                            and last[1][1] == '-1'):
+                        # a flexible array member has no size, but the
+                        # alignment of its elements.
+                        alignment = self.get_layout(translate(last[1][0]))[1]
+                        if alignment is not None:
+                            members[-1] = ((0, alignment), None, True)
+            else:
+                members = [(self.get_layout(typ), None, not name.startswith('!'))
+                        for name, typ in obj.members.iteritems()]
+            if any(layout == unknown for layout, bits, named in members):
+                return unknown
+            return get_compound_layout(members, kind == 'UNION')
+        return unknown
+
+    def get_resolved_type(self, tag):
+        """
+            return a dictionary containing the canonical type of *tag*
+            and its size and alignment, if known.
+        """
+        if tag is None:
+            return None
+        if tag not in self._resolved_types:
+            size, alignment = self.get_layout(tag)
+            self._resolved_types[tag] = {
+                    'type': self.get_canonical_type(tag),
+                    'size': size,
+                    'alignment': alignment,
+                    }
+        return self._resolved_types[tag]
+
+    def get_parameter_type(self, tag):
+        """
+            return the canonical type of a function parameter declared
+            as *tag*. Arrays and functions decay to pointers, also if
+            they are hidden behind a typedef.
+        """
+        parsed = parse_string(self.get_canonical_type(tag))
+        if isinstance(parsed, tuple):
+            if parsed[0] == 'ARRAY':
+                parsed = ('POINTER', (parsed[1][0],))
+            elif parsed[0] == 'FUNCTIONTYPE':
+                parsed = ('POINTER', (parsed,))
+        return translate(parsed)
+
+    def resolve_signatures(self):
+        """
+            precompute the resolved types (see `get_resolved_type`) of all
+            typedef targets and function signatures, and store them in
+            `resolved`. They are also included in the JSON output.
+        """
+        for tag, obj in self.objects.iteritems():
+            if isinstance(obj, Typedef):
+                self.resolved[tag] = self.get_resolved_type(obj.target)
+            elif isinstance(obj, Function):
+                self.resolved[tag] = {
+                        'rettype': self.get_resolved_type(obj.rettype),
+                        'arguments': [(name,
+                            self.get_resolved_type(self.get_parameter_type(typ)))
+                            for name, typ in obj.arguments.iteritems()],
+                        }
+
     def analyze(self):
         # apply names for unnamed stuff.
         for decl in self.namespace.classes(allow_empty=True):
             if not decl.name:
-                name = NAME_GEN.next()
+                name = self.name_gen.next()
                 decl._name = name
                 # I feel dirty.
                 decl.demangled = None
             # generate a class types table.
             self.class_types[decl.name] = decl.class_type
         # make names for unnamed enums.
-        for decl in self.namespace.enums(name='', allow_empty=True):
-            name = NAME_GEN.next()
+        for decl in self.namespace.enumerations(name='', allow_empty=True):
+            name = self.name_gen.next()
             decl._name = name
             decl.demangled = None
         # and analyze the rest
-        self.analyze_classes()
-        self.analyze_enumerations()
-        self.analyze_typedefs()
-        self.analyze_functions()
+        if self.sink is not None:
+            self.analyze_chunked()
+        else:
+            self.analyze_classes()
+            self.analyze_enumerations()
+            self.analyze_typedefs()
+            self.analyze_functions()
+        if self.resolve:
+            self.resolve_signatures()
+
+    def analyze_chunked(self):
+        """
+            analyze the namespace in chunks of `chunk_size` top-level
+            declarations, and remove each chunk from the namespace
+            afterwards, so it can be garbage collected. Objects are
+            not grouped by kind then.
+        """
+        self.namespace.clear_optimizer()
+        declarations = self.namespace.declarations
+        while declarations:
+            chunk = declarations[:self.chunk_size]
+            del declarations[:self.chunk_size]
+            self.analyze_declarations(chunk)
+
+    def analyze_declarations(self, declarations):
+        for decl in declarations:
+            if isinstance(decl, pygccxml.declarations.class_t):
+                self.analyze_class(decl)
+                # nested structs and unions
+                self.analyze_declarations(decl.declarations)
+            elif isinstance(decl, pygccxml.declarations.enumeration_t):
+                self.analyze_enum(decl)
+            elif isinstance(decl, pygccxml.declarations.typedef_t):
+                self.analyze_typedef(decl)
+            elif isinstance(decl, pygccxml.declarations.free_function_t):
+                self.analyze_function(decl)
+            elif isinstance(decl, pygccxml.declarations.namespace_t):
+                self.analyze_declarations(decl.declarations)
 
     def analyze_classes(self):
         """
@@ -376,43 +946,46 @@ class Analyzer(object):
         # funny in gccxml: The latter seems to be artificial. So - if the class object
         # is not artificial, the class declaration is actually a typedef'ed anon struct.
         if not class_.is_artificial:
-            name = NAME_GEN.next()
+            name = self.name_gen.next()
         if class_.class_type == pygccxml.declarations.CLASS_TYPES.STRUCT:
             obj = Struct(format_coord(class_.location), name)
         else:
             obj = Union(format_coord(class_.location), name)
+        if self.sink is None:
+            # gccxml knows about attributes and `#pragma pack`.
+            self.known_layouts[obj.tag] = (class_.byte_size, class_.byte_align)
         # add all members, but only variables, because all other stuff
         # is evil C++ stuff.
         for member in class_.get_members():
             if isinstance(member, pygccxml.declarations.variable_t):
-                type_tag = self.resolve_type(member.type)
+                type_tag = self.resolve_type(get_decl_type(member))
                 if class_.class_type == pygccxml.declarations.CLASS_TYPES.STRUCT:
                     obj.add_member(member.name, type_tag, member.bits)
                 else:
                     obj.add_member(member.name, type_tag)
         # add it to the objects
-        self.objects[obj.tag] = obj
+        self.add_object(obj)
         if not class_.is_artificial:
             td = Typedef(
                     format_coord(class_.location),
                     class_.name,
                     obj.tag
             )
-            self.objects[td.tag] = td
+            self.add_object(td)
 
     def analyze_enum(self, enum):
         obj = Enum(format_coord(enum.location), enum.name)
         for value in enum.values:
             obj.add_member(value[0], value[1])
-        self.objects[obj.tag] = obj
+        self.add_object(obj)
 
     def analyze_typedef(self, typedef):
         obj = Typedef(
                 format_coord(typedef.location),
                 typedef.name,
-                self.resolve_type(typedef.type)
+                self.resolve_type(get_decl_type(typedef))
                 )
-        self.objects[obj.tag] = obj
+        self.add_object(obj)
 
     def analyze_function(self, function):
         arguments = odict()
@@ -421,18 +994,18 @@ class Analyzer(object):
             if arg.ellipsis:
                 varargs = True
             else:
-                arguments[arg.name] = self.resolve_type(arg.type)
+                arguments[arg.name] = self.resolve_type(get_decl_type(arg))
         rettype = None
         if function.return_type:
             rettype = self.resolve_type(function.return_type)
-        self.objects[function.name] = Function(
+        self.add_object(Function(
                 format_coord(function.location),
                 function.name,
                 rettype,
                 arguments,
                 varargs,
                 ('extern',) if function.has_extern else None
-                )
+                ))
 
     def analyze_function_type(self, function):
         arguments = []
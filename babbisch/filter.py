@@ -1,5 +1,6 @@
 import re
 import shlex
+import subprocess
 
 FLAG_NEW_FILE = '1'
 FLAG_RETURN = '2'
@@ -12,11 +13,23 @@ def include_exclude(include_regexes, exclude_regexes):
                     for regex in exclude_regexes))
     return include
 
-def filter_headers(in_text, include):
+def preprocess(filename, include_paths=(), cpp='cpp'):
+    """
+        run the C preprocessor *cpp* on *filename* and return its output.
+    """
+    args = [cpp]
+    for path in include_paths:
+        args.extend(('-I', path))
+    args.append(filename)
+    return subprocess.check_output(args)
+
+def filter_headers(in_text, include, keep_markers=False):
     """
         return a modified version of the cpp-preprocessed string *in_text*
         without cpp information (lines starting with '#') and only
         containing headers where ``include(filename)`` returns True.
+        If *keep_markers* is True, the line markers of the included
+        headers are kept, so coordinates can still be determined.
     """
     idx = 0
     unwanted = []
@@ -43,6 +56,8 @@ def filter_headers(in_text, include):
                 depth -= 1
                 if (unwanted and unwanted[-1] == depth):
                     del unwanted[-1]
+            if keep_markers and not unwanted:
+                out_text += line
 #            else:
 #                out_text += line + '\n' # no cpp information left. TODO: okay?
             idx += len(line)
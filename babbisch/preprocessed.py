@@ -0,0 +1,1058 @@
+# -*- coding: utf-8 -*-
+
+"""
+    An alternative frontend that analyzes cpp-preprocessed C code
+    directly, without gccxml. It only understands top-level C
+    declarations (structs, unions, enums, typedefs and function
+    prototypes), but that's all the `Analyzer` looks at anyway.
+
+    The objects and tags it produces follow the conventions of the
+    gccxml frontend, so both frontends can be used interchangeably.
+"""
+
+import re
+
+from .odict import odict
+from .analyze import (Analyzer, AnalyzingError, ImplementationError,
+        Struct, Union, Enum, Typedef, Function, FunctionType,
+        LAYOUTS, POINTER_LAYOUT, format_tag, get_compound_layout,
+        _name_generator)
+
+import pygccxml.declarations
+
+#: the size of arrays with unknown size, like pygccxml's `array_t.SIZE_UNKNOWN`.
+ARRAY_SIZE_UNKNOWN = -1
+
+TOKEN_RE = re.compile(r'''
+    (?P<marker>^\#[^\n]*)
+    |(?P<newline>\n)
+    |(?P<space>[ \t\r\f\v]+|\\\n)
+    |(?P<comment>/\*.*?\*/|//[^\n]*)
+    |(?P<ident>[A-Za-z_$][A-Za-z0-9_$]*)
+    |(?P<number>(?:0[xX][0-9a-fA-F]+|[0-9]*\.?[0-9]+(?:[eE][+-]?[0-9]+)?)[uUlLfF]*)
+    |(?P<string>L?"(?:\\.|[^\\"\n])*")
+    |(?P<char>L?'(?:\\.|[^\\'\n])*')
+    |(?P<punct>\.\.\.|<<=|>>=|->|\+\+|--|<<|>>|<=|>=|==|!=|&&|\|\||[-+*/%&|^!~<>=?:;,.(){}\[\]\#])
+''', re.MULTILINE | re.VERBOSE | re.DOTALL)
+
+MARKER_RE = re.compile(r'\#\s*(?:line\s+)?(\d+)\s+"((?:\\.|[^\\"])*)"')
+
+PRAGMA_PACK_RE = re.compile(r'\#\s*pragma\s+pack\s*\(([^)]*)\)')
+
+QUALIFIERS = {
+        'const': 'CONST',
+        '__const': 'CONST',
+        '__const__': 'CONST',
+        'volatile': 'VOLATILE',
+        '__volatile': 'VOLATILE',
+        '__volatile__': 'VOLATILE',
+        'restrict': 'RESTRICT',
+        '__restrict': 'RESTRICT',
+        '__restrict__': 'RESTRICT',
+        }
+
+TYPE_SPECIFIERS = {
+        'void': 'void',
+        'char': 'char',
+        'short': 'short',
+        'int': 'int',
+        'long': 'long',
+        'float': 'float',
+        'double': 'double',
+        'signed': 'signed',
+        '__signed': 'signed',
+        '__signed__': 'signed',
+        'unsigned': 'unsigned',
+        '_Bool': '_Bool',
+        '_Complex': '_Complex',
+        '__complex__': '_Complex',
+        '__int128': '__int128',
+        }
+
+STORAGE_SPECIFIERS = set(('typedef', 'extern', 'static', 'auto', 'register',
+        'inline', '__inline', '__inline__', '_Noreturn', '_Thread_local',
+        '__thread'))
+
+#: keywords that are followed by a parenthesized group we don't care about.
+EXTENSIONS = set(('__attribute__', '__attribute', '__asm__', '__asm', 'asm',
+        '__declspec', '_Alignas'))
+
+#: attributes that change the layout of a type. They are skipped like
+#: all attributes, but sizes and alignments are unknown then.
+LAYOUT_ATTRIBUTES = set(('packed', '__packed__', 'aligned', '__aligned__'))
+
+#: keywords we just skip.
+IGNORED = set(('__extension__',))
+
+COMPOUNDS = {
+        'struct': 'STRUCT',
+        'union': 'UNION',
+        'enum': 'ENUM',
+        }
+
+def _get_fundamental(specifiers):
+    """
+        return the gccxml name of the fundamental type described by
+        the list of type specifier keywords *specifiers*.
+    """
+    longs = specifiers.count('long')
+    base = [s for s in specifiers if s in ('void', 'char', 'int', 'float',
+        'double', '_Bool', '__int128')]
+    base = base[0] if base else 'int'
+    signed = 'signed' in specifiers
+    unsigned = 'unsigned' in specifiers
+    if '_Complex' in specifiers:
+        return 'complex %s' % ('long double' if longs else base)
+    if base == 'char':
+        if signed:
+            return 'signed char'
+        elif unsigned:
+            return 'unsigned char'
+        return 'char'
+    elif base == 'int':
+        if 'short' in specifiers:
+            name = 'short %sint'
+        elif longs == 1:
+            name = 'long %sint'
+        elif longs > 1:
+            name = 'long long %sint'
+        else:
+            return 'unsigned int' if unsigned else 'int'
+        return name % ('unsigned ' if unsigned else '')
+    elif base == 'double' and longs:
+        return 'long double'
+    elif base == '_Bool':
+        return 'bool'
+    elif base == '__int128':
+        return '__uint128_t' if unsigned else '__int128_t'
+    return base
+
+class ParsingError(AnalyzingError):
+    pass
+
+class Compound(object):
+    """
+        a struct, union or enum definition found while parsing. The
+        name of anonymous compounds is assigned later, because the
+        order has to be the same as in the gccxml frontend.
+    """
+    def __init__(self, kind, name, coord):
+        self.kind = kind
+        self.name = name
+        self.coord = coord
+        self.typedef_name = None
+        self.members = []
+        # True if attributes or `#pragma pack` change the layout.
+        self.unknown_layout = False
+
+    def get_tag(self):
+        if self.typedef_name is not None:
+            # typedef'd anonymous compound. gccxml names it after
+            # the typedef, see `Analyzer.analyze_class`.
+            if self.kind == 'ENUM':
+                return 'ENUM(%s)' % self.typedef_name
+            return self.typedef_name
+        return '%s(%s)' % (self.kind, self.name)
+
+def to_tag(type):
+    """
+        convert the type tuple *type* created by the parser to a tag.
+    """
+    kind = type[0]
+    if kind == 'tag':
+        return type[1]
+    elif kind == 'compound':
+        return type[1].get_tag()
+    elif kind == 'ARRAY':
+        return 'ARRAY(%s, %s)' % (to_tag(type[1]), format_tag(type[2]))
+    elif kind == 'FUNCTION':
+        return FunctionType(None,
+                to_tag(type[1]),
+                [to_tag(_strip_qualifiers(_decay(t))) for name, t in type[2]],
+                type[3]).tag
+    else:
+        return '%s(%s)' % (kind, to_tag(type[1]))
+
+def _decay(type):
+    """
+        adjust the type of a function parameter: arrays and functions
+        decay to pointers.
+    """
+    if type[0] == 'ARRAY':
+        return ('POINTER', type[1])
+    elif type[0] == 'FUNCTION':
+        return ('POINTER', type)
+    return type
+
+def _strip_qualifiers(type):
+    while type[0] in ('CONST', 'VOLATILE', 'RESTRICT'):
+        type = type[1]
+    return type
+
+def tokenize(text):
+    """
+        split the preprocessed C code *text* into tokens and yield
+        them as ``(kind, value, coord)`` tuples, the last one is an
+        ``end`` token. Line markers are used to keep track of the
+        coordinates, and are not yielded.
+    """
+    filename = None
+    line = 1
+    coord = {'file': filename, 'line': line}
+    pos = 0
+    length = len(text)
+    match = TOKEN_RE.match
+    while pos < length:
+        m = match(text, pos)
+        if m is None:
+            raise ParsingError('%s:%d: Unexpected character: %r' % (
+                filename, line, text[pos]))
+        kind = m.lastgroup
+        value = m.group(kind)
+        pos = m.end()
+        if kind == 'newline':
+            line += 1
+            coord = {'file': filename, 'line': line}
+        elif kind == 'marker':
+            marker = MARKER_RE.match(value)
+            if marker is not None:
+                # the marker describes the next line.
+                line = int(marker.group(1)) - 1
+                filename = marker.group(2)
+            else:
+                pragma = PRAGMA_PACK_RE.match(value)
+                if pragma is not None:
+                    yield ('pragma', pragma.group(1), coord)
+            # other directives (#pragma, #ident) are ignored.
+        elif kind == 'comment':
+            if '\n' in value:
+                line += value.count('\n')
+                coord = {'file': filename, 'line': line}
+        elif kind != 'space':
+            yield (kind, value, coord)
+    yield ('end', '', coord)
+
+def _parse_int(value):
+    value = value.rstrip('uUlL')
+    if value.lower().startswith('0x'):
+        return int(value, 16)
+    elif len(value) > 1 and value.startswith('0'):
+        return int(value, 8)
+    return int(value)
+
+CHAR_ESCAPES = {
+        'n': '\n', 't': '\t', 'r': '\r', '0': '\0', 'a': '\a',
+        'b': '\b', 'f': '\f', 'v': '\v',
+        }
+
+def _parse_char(value):
+    value = value.lstrip('L')[1:-1]
+    if value.startswith('\\'):
+        if value[1] in 'xX':
+            return int(value[2:], 16)
+        elif value[1].isdigit():
+            return int(value[1:], 8)
+        return ord(CHAR_ESCAPES.get(value[1], value[1]))
+    return ord(value)
+
+def _c_div(a, b):
+    q = abs(a) // abs(b)
+    return q if (a < 0) == (b < 0) else -q
+
+def _c_mod(a, b):
+    return a - b * _c_div(a, b)
+
+#: binary operators by precedence, see `Parser.parse_expression`.
+BINARY_OPERATORS = {
+        '||': (1, lambda a, b: int(bool(a or b))),
+        '&&': (2, lambda a, b: int(bool(a and b))),
+        '|': (3, lambda a, b: a | b),
+        '^': (4, lambda a, b: a ^ b),
+        '&': (5, lambda a, b: a & b),
+        '==': (6, lambda a, b: int(a == b)),
+        '!=': (6, lambda a, b: int(a != b)),
+        '<': (7, lambda a, b: int(a < b)),
+        '>': (7, lambda a, b: int(a > b)),
+        '<=': (7, lambda a, b: int(a <= b)),
+        '>=': (7, lambda a, b: int(a >= b)),
+        '<<': (8, lambda a, b: a << b),
+        '>>': (8, lambda a, b: a >> b),
+        '+': (9, lambda a, b: a + b),
+        '-': (9, lambda a, b: a - b),
+        '*': (10, lambda a, b: a * b),
+        '/': (10, _c_div),
+        '%': (10, _c_mod),
+        }
+
+UNARY_OPERATORS = {
+        '-': lambda a: -a,
+        '+': lambda a: a,
+        '~': lambda a: ~a,
+        '!': lambda a: int(not a),
+        }
+
+#: integer types with a known signedness. `char` is missing, because
+#: its signedness depends on the platform.
+SIGNED_INTEGERS = {
+        'signed char': True,
+        'unsigned char': False,
+        'short int': True,
+        'short unsigned int': False,
+        'int': True,
+        'unsigned int': False,
+        'long int': True,
+        'long unsigned int': False,
+        'long long int': True,
+        'long long unsigned int': False,
+        }
+
+class Parser(object):
+    """
+        a hand-written recursive descent parser for C declarations.
+        Types are represented as tuples:
+
+        * ``('tag', tag)`` for fundamental types and typedef names
+        * ``('compound', compound)`` for structs, unions and enums
+        * ``('POINTER', type)``, ``('CONST', type)``, ``('VOLATILE', type)``
+          and ``('RESTRICT', type)``
+        * ``('ARRAY', type, size)``
+        * ``('FUNCTION', rettype, [(name, type), ...], varargs)``
+    """
+    def __init__(self, tokens):
+        self.stream = iter(tokens)
+        self.tokens = [] # tokens read from the stream, not released yet
+        self.pos = 0
+        self.typedef_names = set()
+        # only what constant expressions need is kept for the whole
+        # input: for `sizeof`, typedef name or compound tag:
+        # (size, alignment), or None if unknown
+        self.layouts = {}
+        self.integer_typedefs = {} # name: integer type, for casts
+        self.layout_attributes = 0 # number of layout attributes skipped
+        self.packing = None # argument of the current `#pragma pack`
+        self.packing_stack = []
+        self.enum_values = {}
+        self.compounds = [] # defined compounds, in order of appearance
+        self.compound_types = {} # name: struct or union
+        # (coord, name, type, unknown_layout) tuples
+        self.typedefs = []
+        # (coord, name, type, storage) tuples
+        self.functions = []
+
+    # token helpers
+
+    def peek(self, offset=0):
+        index = self.pos + offset
+        while index >= len(self.tokens):
+            token = next(self.stream, None)
+            if token is None:
+                # past the end, repeat the end token.
+                return self.tokens[-1]
+            elif token[0] == 'pragma':
+                self.set_packing(token[1])
+                continue
+            self.tokens.append(token)
+        return self.tokens[index]
+
+    def next(self):
+        token = self.peek()
+        self.pos += 1
+        return token
+
+    def set_packing(self, arguments):
+        """
+            handle ``#pragma pack(arguments)``. We only need to know
+            whether any packing is active.
+        """
+        arguments = [arg.strip() for arg in arguments.split(',') if arg.strip()]
+        if not arguments:
+            self.packing = None
+        elif arguments[0] == 'push':
+            self.packing_stack.append(self.packing)
+            if len(arguments) > 1:
+                self.packing = arguments[-1]
+        elif arguments[0] == 'pop':
+            if self.packing_stack:
+                self.packing = self.packing_stack.pop()
+            else:
+                self.packing = None
+        elif arguments[0] != 'show':
+            self.packing = arguments[0]
+
+    def error(self, message, token=None):
+        if token is None:
+            token = self.peek()
+        coord = token[2]
+        return ParsingError('%s:%s: %s (at %r)' % (
+            coord['file'], coord['line'], message, token[1]))
+
+    def expect(self, value):
+        token = self.next()
+        if token[1] != value or token[0] in ('string', 'char'):
+            raise self.error('Expected %r' % value, token)
+        return token
+
+    def accept(self, value):
+        if self.peek()[1] == value and self.peek()[0] == 'punct':
+            self.pos += 1
+            return True
+        return False
+
+    def skip_group(self):
+        """
+            skip a balanced group of parentheses, brackets or braces
+            starting at the current token.
+        """
+        depth = 0
+        while True:
+            kind, value, coord = self.next()
+            if kind == 'end':
+                raise self.error('Unbalanced group')
+            elif kind == 'punct':
+                if value in '([{':
+                    depth += 1
+                elif value in ')]}':
+                    depth -= 1
+                    if not depth:
+                        return
+
+    def skip_extensions(self):
+        """
+            skip gcc extensions like ``__attribute__((...))`` and
+            ``__asm__("...")``.
+        """
+        while True:
+            kind, value, coord = self.peek()
+            if kind != 'ident':
+                return
+            if value in EXTENSIONS:
+                self.pos += 1
+                start = self.pos
+                if self.peek()[1] == '(':
+                    self.skip_group()
+                if value == '_Alignas' or any(
+                        token[0] == 'ident' and token[1] in LAYOUT_ATTRIBUTES
+                        for token in self.tokens[start:self.pos]):
+                    self.layout_attributes += 1
+            elif value in IGNORED:
+                self.pos += 1
+            elif value == '_Atomic':
+                # neither gccxml nor the tags know about atomic types.
+                raise ImplementationError('%s:%s: Unsupported _Atomic' % (
+                    coord['file'], coord['line']))
+            else:
+                return
+
+    def skip_until(self, stops):
+        """
+            skip tokens until one of *stops* is found on the top level.
+        """
+        while True:
+            kind, value, coord = self.peek()
+            if kind == 'end':
+                return
+            elif kind == 'punct':
+                if value in stops:
+                    return
+                elif value in ('(', '[', '{'):
+                    self.skip_group()
+                    continue
+            self.pos += 1
+
+    def is_type_start(self, token):
+        kind, value, coord = token
+        return kind == 'ident' and (value in TYPE_SPECIFIERS
+                or value in QUALIFIERS
+                or value in COMPOUNDS
+                or value in self.typedef_names)
+
+    # declarations
+
+    def parse(self, callback=None):
+        """
+            parse all declarations. If *callback* is given, it is called
+            with the parser after each top-level declaration. The
+            declarations in `compounds`, `typedefs` and `functions` and
+            the tokens parsed so far are released after each call then.
+        """
+        while self.peek()[0] != 'end':
+            self.parse_external_declaration()
+            if callback is not None:
+                callback(self)
+                del self.compounds[:]
+                del self.typedefs[:]
+                del self.functions[:]
+                del self.tokens[:self.pos]
+                self.pos = 0
+
+    def parse_external_declaration(self):
+        self.skip_extensions()
+        token = self.peek()
+        if token[1] == ';':
+            self.pos += 1
+            return
+        elif token[1] == '_Static_assert':
+            self.skip_until(';')
+            self.expect(';')
+            return
+        attributes = self.layout_attributes
+        storage, base = self.parse_specifiers()
+        if self.accept(';'):
+            # just a struct/union/enum declaration.
+            return
+        while True:
+            name, type, coord = self.parse_declarator(base)
+            self.skip_extensions()
+            if 'typedef' in storage:
+                self.add_typedef(coord, name, type,
+                        self.layout_attributes != attributes)
+            elif type[0] == 'FUNCTION':
+                self.functions.append((coord, name, type,
+                    ('extern',) if 'extern' in storage else None))
+                if self.peek()[1] == '{':
+                    # a function definition. Just skip the body.
+                    self.skip_group()
+                    return
+            # variables are not of interest.
+            if self.accept('='):
+                self.skip_until((',', ';'))
+            if self.accept(','):
+                continue
+            self.expect(';')
+            return
+
+    def add_typedef(self, coord, name, type, unknown_layout=False):
+        """
+            add a typedef. If *unknown_layout* is True, its declaration
+            has attributes that change the layout.
+        """
+        self.typedef_names.add(name)
+        base = _strip_qualifiers(type)
+        if base[0] == 'tag':
+            integer = self.integer_typedefs.get(base[1], base[1])
+            if integer == 'bool' or integer in SIGNED_INTEGERS:
+                self.integer_typedefs[name] = integer
+        if (type[0] == 'compound' and type[1].name is None
+                and type[1].typedef_name is None):
+            # typedef'd anonymous compound, gccxml does not
+            # create a typedef here.
+            type[1].typedef_name = name
+            type[1].unknown_layout |= unknown_layout
+            if type[1].kind != 'ENUM':
+                self.compound_types[name] = type[1].kind
+        else:
+            self.typedefs.append((coord, name, type, unknown_layout))
+        if unknown_layout:
+            self.layouts[name] = None
+        else:
+            self.layouts[name] = self.get_known_layout(type, coord)
+
+    def parse_specifiers(self):
+        """
+            parse declaration specifiers. Return a tuple
+            ``(storage specifiers, base type)``.
+        """
+        storage = []
+        specifiers = []
+        qualifiers = []
+        base = None
+        while True:
+            self.skip_extensions()
+            kind, value, coord = self.peek()
+            if kind != 'ident':
+                break
+            if value in STORAGE_SPECIFIERS:
+                storage.append(value)
+            elif value in QUALIFIERS:
+                qualifiers.append(QUALIFIERS[value])
+            elif value in TYPE_SPECIFIERS:
+                specifiers.append(TYPE_SPECIFIERS[value])
+            elif value in COMPOUNDS and base is None and not specifiers:
+                self.pos += 1
+                base = self.parse_compound(COMPOUNDS[value], coord)
+                continue
+            elif base is None and not specifiers:
+                # a typedef name. It does not have to be known,
+                # it might be defined in a filtered header.
+                base = ('tag', value)
+            else:
+                # the declarator name.
+                break
+            self.pos += 1
+        if base is None:
+            if not specifiers:
+                raise self.error('Expected a type')
+            base = ('tag', _get_fundamental(specifiers))
+        # qualifiers are applied in a fixed order, so that
+        # `const volatile int` and `volatile const int` are equal.
+        for qualifier in ('RESTRICT', 'VOLATILE', 'CONST'):
+            if qualifier in qualifiers:
+                base = (qualifier, base)
+        return storage, base
+
+    def parse_compound(self, kind, coord):
+        attributes = self.layout_attributes
+        self.skip_extensions()
+        name = None
+        if self.peek()[0] == 'ident':
+            name = self.next()[1]
+            if kind != 'ENUM':
+                self.compound_types.setdefault(name, kind)
+        self.skip_extensions()
+        if self.peek()[1] != '{':
+            if name is None:
+                raise self.error('Expected a name or a body')
+            return ('tag', '%s(%s)' % (kind, name))
+        self.pos += 1
+        compound = Compound(kind, name, coord)
+        packing = self.packing
+        if kind != 'ENUM' and name is not None:
+            self.compound_types[name] = kind
+        # add it before nested compounds are parsed, like
+        # pygccxml's recursive declaration search does.
+        self.compounds.append(compound)
+        if kind == 'ENUM':
+            self.parse_enum_body(compound)
+        else:
+            self.parse_struct_body(compound)
+        self.skip_extensions()
+        compound.unknown_layout = (self.layout_attributes != attributes
+                or packing is not None or self.packing is not None)
+        if name is not None:
+            self.layouts['%s(%s)' % (kind, name)] = self.get_known_layout(
+                    ('compound', compound), coord)
+        if name is None:
+            return ('compound', compound)
+        return ('tag', '%s(%s)' % (kind, name))
+
+    def parse_enum_body(self, compound):
+        value = 0
+        while not self.accept('}'):
+            kind, name, coord = self.next()
+            if kind != 'ident':
+                raise self.error('Expected an enumerator name')
+            self.skip_extensions()
+            if self.accept('='):
+                value = self.parse_expression()
+            compound.members.append((name, value))
+            self.enum_values[name] = value
+            value += 1
+            if not self.accept(','):
+                self.expect('}')
+                break
+
+    def parse_struct_body(self, compound):
+        while not self.accept('}'):
+            self.skip_extensions()
+            if self.accept(';'):
+                continue
+            if self.peek()[1] == '_Static_assert':
+                self.skip_until(';')
+                self.expect(';')
+                continue
+            storage, base = self.parse_specifiers()
+            if self.accept(';'):
+                # anonymous struct or union member.
+                compound.members.append(('', base, None))
+                continue
+            while True:
+                if self.peek()[1] == ':':
+                    # unnamed bitfield
+                    name, type = '', base
+                else:
+                    name, type, coord = self.parse_declarator(base)
+                bits = None
+                if self.accept(':'):
+                    bits = self.parse_expression()
+                self.skip_extensions()
+                compound.members.append((name, type, bits))
+                if not self.accept(','):
+                    self.expect(';')
+                    break
+
+    def parse_declarator(self, base, abstract=False):
+        """
+            parse a (possibly *abstract*) declarator applied to the type
+            *base*. Return a tuple ``(name, type, coord)``.
+        """
+        name, coord, operations = self.parse_declarator_operations(abstract)
+        type = base
+        for operation in operations:
+            if operation[0] == 'ARRAY':
+                type = ('ARRAY', type, operation[1])
+            elif operation[0] == 'FUNCTION':
+                type = ('FUNCTION', type, operation[1], operation[2])
+            else:
+                type = (operation[0], type)
+        return name, type, coord
+
+    def parse_declarator_operations(self, abstract):
+        """
+            return ``(name, coord, operations)``, where *operations*
+            is a list of type constructors to apply to the base type,
+            innermost first.
+        """
+        pointers = []
+        while True:
+            self.skip_extensions()
+            if self.accept('*') or self.accept('^'):
+                pointers.append(('POINTER',))
+            elif self.peek()[1] in QUALIFIERS:
+                pointers.append((QUALIFIERS[self.next()[1]],))
+            else:
+                break
+        name, coord, inner = None, self.peek()[2], []
+        kind, value, token_coord = self.peek()
+        if kind == 'ident':
+            # the specifiers are parsed already, so this is the name,
+            # even if it is also a typedef name, like in
+            # `PyCapsule_Destructor destructor`.
+            name, coord = value, token_coord
+            self.pos += 1
+        elif value == '(' and self.is_grouping():
+            self.pos += 1
+            name, coord, inner = self.parse_declarator_operations(abstract)
+            self.expect(')')
+        elif not abstract:
+            raise self.error('Expected a declarator')
+        suffixes = []
+        while True:
+            self.skip_extensions()
+            if self.accept('['):
+                while self.peek()[1] in QUALIFIERS or self.peek()[1] == 'static':
+                    self.pos += 1
+                if self.accept(']'):
+                    size = ARRAY_SIZE_UNKNOWN
+                elif abstract:
+                    size = self.parse_parameter_array_size()
+                else:
+                    size = self.parse_expression()
+                    self.expect(']')
+                suffixes.append(('ARRAY', size))
+            elif self.accept('('):
+                arguments, varargs = self.parse_parameters()
+                suffixes.append(('FUNCTION', arguments, varargs))
+            else:
+                break
+        suffixes.reverse()
+        return name, coord, pointers + suffixes + inner
+
+    def parse_parameter_array_size(self):
+        """
+            parse the size of an array parameter, including the closing
+            bracket. The size of variable length arrays like ``a[n]``
+            or ``a[*]`` is unknown, but in a parameter, that does not
+            matter, because the array decays to a pointer.
+        """
+        start = self.pos
+        try:
+            size = self.parse_expression()
+            self.expect(']')
+            return size
+        except AnalyzingError:
+            self.pos = start
+            self.skip_until(']')
+            self.expect(']')
+            return ARRAY_SIZE_UNKNOWN
+
+    def is_grouping(self):
+        """
+            return True if the parenthesis at the current token starts
+            a nested declarator, and not a parameter list.
+        """
+        kind, value, coord = self.peek(1)
+        if kind == 'punct':
+            return value in ('*', '^', '(')
+        return (kind == 'ident'
+                and not self.is_type_start(self.peek(1))
+                and value not in STORAGE_SPECIFIERS)
+
+    def parse_parameters(self):
+        """
+            parse a parameter list, the opening parenthesis is
+            already consumed. Return ``([(name, type), ...], varargs)``.
+        """
+        arguments = []
+        varargs = False
+        if (self.peek()[1] == 'void' and self.peek(1)[1] == ')'):
+            self.pos += 2
+            return arguments, varargs
+        while not self.accept(')'):
+            if self.accept('...'):
+                varargs = True
+                self.expect(')')
+                break
+            storage, base = self.parse_specifiers()
+            name, type, coord = self.parse_declarator(base, abstract=True)
+            self.skip_extensions()
+            if name is None:
+                # pygccxml's default argument name.
+                name = 'arg%d' % len(arguments)
+            arguments.append((name, type))
+            if not self.accept(','):
+                self.expect(')')
+                break
+        return arguments, varargs
+
+    # constant expressions
+
+    def parse_expression(self, min_precedence=0):
+        """
+            parse and evaluate an integer constant expression.
+        """
+        value = self.parse_unary()
+        while True:
+            kind, op, coord = self.peek()
+            if op == '?' and kind == 'punct' and min_precedence == 0:
+                self.pos += 1
+                if_true = self.parse_expression()
+                self.expect(':')
+                if_false = self.parse_expression()
+                value = if_true if value else if_false
+                continue
+            if kind != 'punct' or op not in BINARY_OPERATORS:
+                return value
+            precedence, function = BINARY_OPERATORS[op]
+            if precedence <= min_precedence:
+                return value
+            self.pos += 1
+            value = function(value, self.parse_expression(precedence))
+
+    def parse_unary(self):
+        kind, value, coord = self.next()
+        if kind == 'number':
+            try:
+                return _parse_int(value)
+            except ValueError:
+                raise self.error('Unsupported number', (kind, value, coord))
+        elif kind == 'char':
+            return _parse_char(value)
+        elif kind == 'ident':
+            if value in self.enum_values:
+                return self.enum_values[value]
+            elif value == 'sizeof' and self.peek()[1] == '(':
+                self.pos += 1
+                storage, base = self.parse_specifiers()
+                name, type, type_coord = self.parse_declarator(base, abstract=True)
+                self.expect(')')
+                return self.get_layout(type, coord)[0]
+            raise ImplementationError('%s:%s: Unsupported constant: %r' % (
+                coord['file'], coord['line'], value))
+        elif kind == 'punct':
+            if value in UNARY_OPERATORS:
+                return UNARY_OPERATORS[value](self.parse_unary())
+            elif value == '(':
+                if self.is_type_start(self.peek()):
+                    storage, base = self.parse_specifiers()
+                    name, type, type_coord = self.parse_declarator(base, abstract=True)
+                    self.expect(')')
+                    return self.cast(self.parse_unary(), type, coord)
+                result = self.parse_expression()
+                self.expect(')')
+                return result
+        raise self.error('Unexpected token in constant expression',
+                (kind, value, coord))
+
+    def cast(self, value, type, coord):
+        """
+            convert the integer *value* to *type*, like a cast does.
+            Only integer types are supported.
+        """
+        type = _strip_qualifiers(type)
+        if type[0] == 'tag':
+            integer = self.integer_typedefs.get(type[1], type[1])
+            if integer == 'bool':
+                return int(bool(value))
+            elif integer in SIGNED_INTEGERS:
+                bits = LAYOUTS[integer][0] * 8
+                value &= (1 << bits) - 1
+                if SIGNED_INTEGERS[integer] and value >= 1 << (bits - 1):
+                    value -= 1 << bits
+                return int(value)
+        raise ImplementationError('%s:%s: Unsupported cast to %r' % (
+            coord['file'], coord['line'], to_tag(type)))
+
+    def get_layout(self, type, coord):
+        """
+            return a tuple ``(size, alignment)`` of *type* on this
+            platform, following the usual C layout rules.
+        """
+        type = _strip_qualifiers(type)
+        kind = type[0]
+        if kind == 'POINTER':
+            return POINTER_LAYOUT
+        elif kind == 'ARRAY' and type[2] != ARRAY_SIZE_UNKNOWN:
+            size, alignment = self.get_layout(type[1], coord)
+            return (type[2] * size, alignment)
+        elif kind == 'compound':
+            return self.get_compound_layout(type[1], coord)
+        elif kind == 'tag':
+            if type[1] in LAYOUTS:
+                return LAYOUTS[type[1]]
+            elif self.layouts.get(type[1]) is not None:
+                return self.layouts[type[1]]
+            elif type[1] in self.layouts:
+                raise ImplementationError(
+                        '%s:%s: Unsupported sizeof: %r has an unknown layout' % (
+                            coord['file'], coord['line'], type[1]))
+        raise ImplementationError('%s:%s: Unsupported sizeof: %r' % (
+            coord['file'], coord['line'], to_tag(type)))
+
+    def get_known_layout(self, type, coord):
+        """
+            return the layout of *type*, or None if it is not supported.
+        """
+        try:
+            return self.get_layout(type, coord)
+        except ImplementationError:
+            return None
+
+    def get_compound_layout(self, compound, coord):
+        if compound.unknown_layout:
+            raise ImplementationError(
+                    '%s:%s: Unsupported sizeof: %r is packed or aligned' % (
+                        coord['file'], coord['line'], compound.get_tag()))
+        elif compound.kind == 'ENUM':
+            return LAYOUTS['int']
+        members = []
+        for index, (name, type, bits) in enumerate(compound.members):
+            if (compound.kind == 'STRUCT' and index == len(compound.members) - 1
+                    and type[0] == 'ARRAY' and type[2] == ARRAY_SIZE_UNKNOWN):
+                # a flexible array member has no size, but the
+                # alignment of its elements.
+                layout = (0, self.get_layout(type[1], coord)[1])
+            else:
+                layout = self.get_layout(type, coord)
+            members.append((layout, bits, bool(name)))
+        return get_compound_layout(members, compound.kind == 'UNION')
+
+class PreprocessedAnalyzer(Analyzer):
+    """
+        an `Analyzer` working on the cpp-preprocessed C code *text*
+        instead of a pygccxml namespace. Use `babbisch.filter.filter_headers`
+        with *keep_markers* to get declarations only from some headers
+        without losing the coordinates.
+    """
+    def __init__(self, text, sink=None, resolve=False):
+        Analyzer.__init__(self, None, sink, resolve)
+        self.text = text
+
+    def analyze(self):
+        if self.sink is not None:
+            self.analyze_incrementally()
+        else:
+            parser = Parser(tokenize(self.text))
+            parser.parse()
+            self.analyze_parsed(parser, self.name_gen, self.name_gen, self.name_gen)
+            self.add_class_types(parser)
+        if self.resolve:
+            self.resolve_signatures()
+
+    def analyze_incrementally(self):
+        """
+            analyze each top-level declaration as soon as it is parsed,
+            so only the tokens of one declaration are kept in memory.
+            The output only differs from `analyze` in its order. To name
+            unnamed compounds like `analyze` does, they are counted in a
+            first parsing pass.
+        """
+        counts = {'ENUM': 0, 'STRUCT': 0, 'UNION': 0}
+        def count(parser):
+            for compound in parser.compounds:
+                if compound.name is None and compound.typedef_name is None:
+                    counts[compound.kind] += 1
+        Parser(tokenize(self.text)).parse(count)
+        classes = counts['STRUCT'] + counts['UNION']
+        class_names = _name_generator()
+        enum_names = _name_generator(classes + 1)
+        typedef_names = _name_generator(classes + counts['ENUM'] + 1)
+        parser = Parser(tokenize(self.text))
+        parser.parse(lambda parser: self.analyze_parsed(
+            parser, class_names, enum_names, typedef_names))
+        self.add_class_types(parser)
+
+    def analyze_parsed(self, parser, class_names, enum_names, typedef_names):
+        """
+            analyze the declarations *parser* has parsed. Unnamed classes,
+            unnamed enums and typedef'd anonymous classes are named from
+            the generators *class_names*, *enum_names* and *typedef_names*.
+        """
+        classes = [c for c in parser.compounds if c.kind != 'ENUM']
+        enums = [c for c in parser.compounds if c.kind == 'ENUM']
+        # apply names for unnamed stuff, in the same order as
+        # `Analyzer.analyze`.
+        for compound in classes:
+            if compound.name is None and compound.typedef_name is None:
+                compound.name = class_names.next()
+                self.class_types[compound.name] = self.get_class_type(compound.kind)
+        for compound in enums:
+            if compound.name is None:
+                if compound.typedef_name is not None:
+                    compound.name = compound.typedef_name
+                else:
+                    compound.name = enum_names.next()
+        # and analyze the rest
+        for compound in classes:
+            self.analyze_compound(compound, typedef_names)
+        for compound in enums:
+            obj = Enum(compound.coord, compound.name)
+            for name, value in compound.members:
+                obj.add_member(name, value)
+            self.add_object(obj)
+            if compound.unknown_layout:
+                self.known_layouts[obj.tag] = (None, None)
+        for coord, name, type, unknown_layout in parser.typedefs:
+            obj = Typedef(coord, name, to_tag(type))
+            self.add_object(obj)
+            if unknown_layout:
+                self.known_layouts[obj.tag] = (None, None)
+        for coord, name, type, storage in parser.functions:
+            self.analyze_declared_function(coord, name, type, storage)
+
+    def add_class_types(self, parser):
+        for name, kind in parser.compound_types.iteritems():
+            self.class_types[name] = self.get_class_type(kind)
+
+    def get_class_type(self, kind):
+        if kind == 'STRUCT':
+            return pygccxml.declarations.CLASS_TYPES.STRUCT
+        else:
+            return pygccxml.declarations.CLASS_TYPES.UNION
+
+    def analyze_compound(self, compound, typedef_names):
+        name = compound.name
+        if compound.typedef_name is not None:
+            # typedef'd anon struct, see `Analyzer.analyze_class`.
+            name = typedef_names.next()
+        if compound.kind == 'STRUCT':
+            obj = Struct(compound.coord, name)
+            for member, type, bits in compound.members:
+                obj.add_member(member, to_tag(type), bits)
+        else:
+            obj = Union(compound.coord, name)
+            for member, type, bits in compound.members:
+                obj.add_member(member, to_tag(type))
+        self.add_object(obj)
+        if compound.unknown_layout:
+            # packed or aligned, see `Parser.get_compound_layout`.
+            self.known_layouts[obj.tag] = (None, None)
+        if compound.typedef_name is not None:
+            td = Typedef(
+                    compound.coord,
+                    compound.typedef_name,
+                    obj.tag
+            )
+            self.add_object(td)
+
+    def analyze_declared_function(self, coord, name, type, storage):
+        arguments = odict()
+        for arg_name, arg_type in type[2]:
+            arguments[arg_name] = to_tag(_decay(arg_type))
+        self.add_object(Function(
+                coord,
+                name,
+                to_tag(type[1]),
+                arguments,
+                type[3],
+                storage
+                ))
@@ -7,19 +7,20 @@ class Token(object):
     END = 5
 
 def lex(next):
-    running = True
-
-    def _shift(chars):
-        char = next()
+    def _next():
         try:
-            while char in chars:
-                char = next()
+            return next()
         except StopIteration:
-            running = False
+            return None
+
+    def _shift(chars):
+        char = _next()
+        while char is not None and char in chars:
+            char = _next()
         return char
 
-    char = next()
-    while running:
+    char = _next()
+    while char is not None:
         if char == '(':
             yield (Token.LPAREN, char)
             char = _shift((' ',))
@@ -31,13 +32,10 @@ def lex(next):
             char = _shift((' ',))
         else:
             s = ''
-            try:
-                while char not in '(),':
-                    # include spaces, e.g. `unsigned int` contains a space
-                    s += char
-                    char = next()
-            except StopIteration:
-                running = False
+            while char is not None and char not in '(),':
+                # include spaces, e.g. `unsigned int` contains a space
+                s += char
+                char = _next()
             yield (Token.IDENTIFIER, s)
     yield (Token.END, '')
 
@@ -61,6 +59,8 @@ def _parse(next, token):
                     raise ParsingError('Malformed argument list, unexpected token: %r' % (token,))
                 if token[0] == Token.COMMA:
                     token = next()
+            # skip the closing parenthesis
+            token = next()
             return (token, (value, tuple(args)))
         else:
             raise ParsingError('Unexpected token: %r' % (token,))
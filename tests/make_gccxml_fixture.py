@@ -0,0 +1,64 @@
+"""
+    write the JSON output of the gccxml frontend for a header to stdout.
+    This is how ``cairo.gccxml.json`` was made, from the top directory::
+
+        PYTHONPATH=. python tests/make_gccxml_fixture.py cairo.h \
+                > tests/cairo.gccxml.json
+
+    gccxml itself is hard to come by these days, so this also works with
+    castxml, its successor (pass its path as the second argument). castxml
+    and newer pygccxml versions differ from gccxml in some details, which
+    are emulated here, see `emulate_gccxml`. Only the coordinates differ
+    then: castxml reports physical lines of the file, and ignores line
+    markers.
+"""
+
+import sys
+
+import pygccxml.parser
+import pygccxml.declarations
+
+from babbisch.analyze import Analyzer
+
+def emulate_gccxml(namespace):
+    """
+        gccxml marks ``struct A { ... }`` as artificial, and names the
+        struct of ``typedef struct { ... } A;`` after the typedef without
+        emitting the typedef, see `Analyzer.analyze_class`. castxml
+        does neither, and adds clang's builtin declarations.
+    """
+    namespace.declarations[:] = [decl for decl in namespace.declarations
+            if decl.location is not None
+            and decl.location.file_name != '<builtin>']
+    typedef_named = set()
+    for typedef in namespace.typedefs(allow_empty=True):
+        base = typedef.decl_type
+        if (isinstance(base, pygccxml.declarations.declarated_t)
+                and isinstance(base.declaration, pygccxml.declarations.class_t)
+                and base.declaration.name == typedef.name):
+            typedef_named.add(typedef.name)
+            typedef.parent.remove_declaration(typedef)
+    for class_ in namespace.classes(allow_empty=True):
+        class_.is_artificial = class_.name not in typedef_named
+    for decl in namespace.decls(
+            decl_type=pygccxml.declarations.class_declaration_t,
+            allow_empty=True):
+        decl.is_artificial = True
+
+def main(filename, castxml=None):
+    if castxml is None:
+        config = pygccxml.parser.config_t()
+    else:
+        config = pygccxml.parser.xml_generator_configuration_t(
+                xml_generator_path=castxml,
+                xml_generator='castxml')
+    decls = pygccxml.parser.parse([filename], config)
+    namespace = pygccxml.declarations.get_global_namespace(decls)
+    if castxml is not None:
+        emulate_gccxml(namespace)
+    analyzer = Analyzer(namespace)
+    analyzer.analyze()
+    sys.stdout.write(analyzer.to_json(indent=2, sort_keys=True))
+
+if __name__ == '__main__':
+    main(*sys.argv[1:])
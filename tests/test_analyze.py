@@ -0,0 +1,215 @@
+import json
+import unittest
+from StringIO import StringIO
+
+from pygccxml import declarations
+
+from babbisch.analyze import (Analyzer, LAYOUTS, POINTER_LAYOUT, HASHES_TAG,
+        JSONWriter)
+from babbisch.preprocessed import PreprocessedAnalyzer
+
+def get_hashes(analyzer):
+    return sorted(analyzer.get_hash(tag) for tag in analyzer.objects)
+
+def analyze(text, **kwargs):
+    analyzer = PreprocessedAnalyzer(text, **kwargs)
+    analyzer.analyze()
+    return analyzer
+
+HEADER = '''
+typedef struct { int x; struct { int y; } inner; } A;
+typedef void (*cb)(A *);
+typedef cb cb2;
+struct s { A a; union { int u; } un; };
+int f(struct s *, cb2);
+'''
+
+def make_namespace():
+    """
+        build the global namespace gccxml would emit for::
+
+            struct point { int x; struct { int y; } inner; };
+            typedef struct point point_t;
+            enum { RED, GREEN };
+            int norm(const point_t *p);
+    """
+    def declare(decl, line):
+        decl.location = declarations.location_t('test.h', line)
+        return decl
+    public = declarations.ACCESS_TYPES.PUBLIC
+    int_t = declarations.int_t()
+    inner = declare(declarations.class_t('', declarations.CLASS_TYPES.STRUCT), 1)
+    inner.is_artificial = True
+    inner.adopt_declaration(declarations.variable_t('y', int_t), public)
+    point = declare(declarations.class_t('point', declarations.CLASS_TYPES.STRUCT), 1)
+    point.is_artificial = True
+    point.adopt_declaration(inner, public)
+    point.adopt_declaration(declarations.variable_t('x', int_t), public)
+    point.adopt_declaration(declarations.variable_t('inner',
+        declarations.declarated_t(inner)), public)
+    typedef = declare(declarations.typedef_t('point_t',
+        declarations.declarated_t(point)), 2)
+    enum = declare(declarations.enumeration_t('', [('RED', 0), ('GREEN', 1)]), 3)
+    function = declare(declarations.free_function_t('norm',
+        return_type=int_t,
+        arguments=[declarations.argument_t('p', declarations.pointer_t(
+            declarations.const_t(declarations.declarated_t(typedef))))]), 4)
+    namespace = declarations.namespace_t('::')
+    for decl in (point, typedef, enum, function):
+        namespace.adopt_declaration(decl)
+    return namespace
+
+class HashTest(unittest.TestCase):
+    def test_coordinates(self):
+        self.assertEqual(get_hashes(analyze(HEADER)),
+                get_hashes(analyze('\n\n' + HEADER)))
+
+    def test_unnamed_compounds(self):
+        # the generated names change, but the hashes do not.
+        first = analyze(HEADER)
+        second = analyze('struct { int z; } v;\n' + HEADER)
+        for tag in ('A', 'cb', 'cb2', 'f', 'STRUCT(s)'):
+            self.assertEqual(first.get_hash(tag), second.get_hash(tag))
+
+    def test_dependencies(self):
+        first = analyze(HEADER)
+        second = analyze(HEADER.replace('int y;', 'long y;'))
+        for tag in ('A', 'cb', 'cb2', 'f', 'STRUCT(s)'):
+            self.assertNotEqual(first.get_hash(tag), second.get_hash(tag))
+
+    def test_cycles(self):
+        text = '''
+            struct a { struct b *b; int x; };
+            struct b { struct a *a; };
+            struct c { struct b *b; };
+            '''
+        first = analyze(text)
+        second = analyze(text.replace('int x;', 'long x;'))
+        hashes = set()
+        for tag in ('STRUCT(a)', 'STRUCT(b)', 'STRUCT(c)'):
+            self.assertNotEqual(first.get_hash(tag), second.get_hash(tag))
+            hashes.add(first.get_hash(tag))
+        self.assertEqual(len(hashes), 3)
+
+class LowMemoryTest(unittest.TestCase):
+    def test_same_objects(self):
+        text = HEADER + '''
+            enum { RED, GREEN };
+            typedef enum { A_ONE } a_enum;
+            int f(struct s *, void (*)(A *));
+            '''
+        analyzer = analyze(text)
+        objects = []
+        analyze(text, sink=objects.append)
+        self.assertEqual(
+                sorted(obj.tag for obj in objects),
+                sorted(analyzer.objects))
+        for obj in objects:
+            expected = analyzer.objects[obj.tag]
+            self.assertEqual(obj.get_state({}), expected.get_state({}))
+
+    def test_gccxml(self):
+        analyzer = Analyzer(make_namespace())
+        analyzer.analyze()
+        objects = []
+        namespace = make_namespace()
+        chunked = Analyzer(namespace, sink=objects.append)
+        chunked.chunk_size = 1
+        chunked.analyze()
+        self.assertEqual(
+                sorted(obj.tag for obj in objects),
+                sorted(analyzer.objects))
+        for obj in objects:
+            expected = analyzer.objects[obj.tag]
+            self.assertEqual(obj.get_state({}), expected.get_state({}))
+        self.assertEqual(namespace.declarations, [])
+
+    def test_resolve(self):
+        self.assertRaises(ValueError, PreprocessedAnalyzer, HEADER,
+                sink=[].append, resolve=True)
+        self.assertRaises(ValueError, Analyzer, make_namespace(),
+                sink=[].append, resolve=True)
+
+    def test_json_writer(self):
+        analyzer = analyze(HEADER)
+        stream = StringIO()
+        writer = JSONWriter(stream)
+        analyze(HEADER, sink=writer)
+        writer.close()
+        output = json.loads(stream.getvalue())
+        self.assertEqual(output[-1], [HASHES_TAG,
+            dict((tag, analyzer.get_hash(tag)) for tag in analyzer.objects)])
+        self.assertEqual(sorted(tag for tag, state in output[:-1]),
+                sorted(analyzer.objects))
+
+RESOLVE_HEADER = '''
+typedef int a;
+typedef a b;
+typedef b c;
+typedef c array[4];
+struct incomplete;
+typedef struct incomplete incomplete_t;
+typedef const incomplete_t *handle;
+typedef struct { c x; const c *y; } pair;
+struct bits { char a; long : 0; char b; };
+struct unions { union { int a; }; union { int b; }; };
+c get(const pair *p, handle h, array v);
+'''
+
+class ResolveTest(unittest.TestCase):
+    def setUp(self):
+        self.analyzer = analyze(RESOLVE_HEADER, resolve=True)
+
+    def test_canonical_type(self):
+        get = self.analyzer.get_canonical_type
+        self.assertEqual(get('c'), 'int')
+        self.assertEqual(get('POINTER(CONST(c))'), 'POINTER(CONST(int))')
+        self.assertEqual(get('array'), 'ARRAY(int, 4)')
+        self.assertEqual(get('handle'), 'POINTER(CONST(STRUCT(incomplete)))')
+        # named after the anonymous unions, like gccxml does.
+        self.assertEqual(get('pair'), 'STRUCT(!Unnamed3)')
+
+    def test_layout(self):
+        get = self.analyzer.get_layout
+        int_size, int_alignment = LAYOUTS['int']
+        self.assertEqual(get('c'), LAYOUTS['int'])
+        self.assertEqual(get('array'), (4 * int_size, int_alignment))
+        self.assertEqual(get('incomplete_t'), (None, None))
+        self.assertEqual(get('handle'), POINTER_LAYOUT)
+        self.assertEqual(get('pair'), (
+            POINTER_LAYOUT[0] * 2, max(int_alignment, POINTER_LAYOUT[1])))
+        # unnamed bitfields do not affect the alignment.
+        self.assertEqual(get('STRUCT(bits)'), (LAYOUTS['long int'][0] + 1, 1))
+        # anonymous members do not overlap.
+        self.assertEqual(get('STRUCT(unions)'), (2 * int_size, int_alignment))
+
+    def test_layout_attributes(self):
+        get = analyze('''
+            struct packed { int a; long b; } __attribute__((__packed__));
+            typedef struct packed packed_t;
+            typedef int wide __attribute__((aligned(16)));
+            struct flexible { int a; char b; char name[]; };
+            ''', resolve=True).get_layout
+        int_size, int_alignment = LAYOUTS['int']
+        self.assertEqual(get('STRUCT(packed)'), (None, None))
+        self.assertEqual(get('packed_t'), (None, None))
+        self.assertEqual(get('ARRAY(wide, 2)'), (None, None))
+        # flexible array members count with their alignment only.
+        self.assertEqual(get('STRUCT(flexible)'), (2 * int_size, int_alignment))
+
+    def test_resolve_signatures(self):
+        resolved = self.analyzer.resolved
+        int_size, int_alignment = LAYOUTS['int']
+        self.assertEqual(resolved['b'],
+                {'type': 'int', 'size': int_size, 'alignment': int_alignment})
+        self.assertEqual(resolved['incomplete_t'],
+                {'type': 'STRUCT(incomplete)', 'size': None, 'alignment': None})
+        self.assertEqual(resolved['get']['rettype'], resolved['b'])
+        self.assertEqual(
+                [(name, typ['type']) for name, typ in resolved['get']['arguments']],
+                [('p', 'POINTER(CONST(STRUCT(!Unnamed3)))'),
+                 ('h', 'POINTER(CONST(STRUCT(incomplete)))'),
+                 ('v', 'POINTER(int)')])
+
+if __name__ == '__main__':
+    unittest.main()
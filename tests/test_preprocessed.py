@@ -0,0 +1,134 @@
+import os
+import json
+import unittest
+from distutils.spawn import find_executable
+
+import pygccxml.parser
+import pygccxml.declarations
+
+from babbisch.analyze import Analyzer, ImplementationError
+from babbisch.preprocessed import PreprocessedAnalyzer
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+CAIRO = os.path.join(HERE, '..', 'cairo.h')
+FIXTURE = os.path.join(HERE, 'cairo.gccxml.json')
+
+def without_coords(output):
+    """
+        return the JSON *output* of an analyzer as a list of
+        ``(tag, state)`` tuples, without the coordinates,
+        because gccxml and cpp do not agree on them.
+    """
+    objects = json.loads(output)
+    for tag, state in objects:
+        del state['coord']
+    return [tuple(item) for item in objects]
+
+def analyze(text, **kwargs):
+    analyzer = PreprocessedAnalyzer(text, **kwargs)
+    analyzer.analyze()
+    return analyzer
+
+class ConformanceTest(unittest.TestCase):
+    """
+        the cpp frontend has to emit the same objects as the gccxml
+        frontend. The checked-in cairo.h is already preprocessed.
+    """
+    def setUp(self):
+        with open(FIXTURE) as f:
+            self.expected = without_coords(f.read())
+
+    def test_cairo(self):
+        with open(CAIRO) as f:
+            analyzer = analyze(f.read())
+        self.assertEqual(without_coords(analyzer.to_json()), self.expected)
+
+    @unittest.skipIf(find_executable('gccxml') is None, 'gccxml is not installed')
+    def test_cairo_gccxml(self):
+        config = pygccxml.parser.config_t(gccxml_path=find_executable('gccxml'))
+        decls = pygccxml.parser.parse([CAIRO], config)
+        analyzer = Analyzer(pygccxml.declarations.get_global_namespace(decls))
+        analyzer.analyze()
+        self.assertEqual(without_coords(analyzer.to_json()), self.expected)
+
+class DeclarationTest(unittest.TestCase):
+    def test_typedef_named_parameter(self):
+        analyzer = analyze('''
+            typedef void (*destructor)(void *);
+            void *new(void *pointer, destructor destructor);
+            ''')
+        self.assertEqual(analyzer.objects['new'].arguments.items(),
+                [('pointer', 'POINTER(void)'), ('destructor', 'destructor')])
+
+    def test_variable_length_array_parameter(self):
+        analyzer = analyze('''
+            int match(int n, int a[n], int b[*], int (*c)[n + 1], int (*d)[4]);
+            ''')
+        self.assertEqual(analyzer.objects['match'].arguments.items(),
+                [('n', 'int'),
+                 ('a', 'POINTER(int)'),
+                 ('b', 'POINTER(int)'),
+                 ('c', 'POINTER(ARRAY(int, -1))'),
+                 ('d', 'POINTER(ARRAY(int, 4))')])
+
+    def test_unnamed_members(self):
+        analyzer = analyze('''
+            struct s {
+                union { int a; };
+                union { double d; };
+                char c : 3;
+                int : 0;
+                char e : 2;
+            };
+            ''')
+        self.assertEqual(analyzer.objects['STRUCT(s)'].members.items(),
+                [('!Member0', ('UNION(!Unnamed1)', None)),
+                 ('!Member1', ('UNION(!Unnamed2)', None)),
+                 ('c', ('char', 3)),
+                 ('!Member3', ('int', 0)),
+                 ('e', ('char', 2))])
+
+    def test_sizeof(self):
+        analyzer = analyze(
+                'struct e { char a; int b; };\n'
+                '#pragma pack(push, 1)\n'
+                '#pragma pack(pop)\n'
+                'struct buf { char b[sizeof(struct e)]; };\n'
+                'struct f { int a; char b; char c[]; };\n'
+                'struct buf2 { char b[sizeof(struct f)]; };\n')
+        self.assertEqual(analyzer.objects['STRUCT(buf)'].members.items(),
+                [('b', ('ARRAY(char, 8)', None))])
+        self.assertEqual(analyzer.objects['STRUCT(buf2)'].members.items(),
+                [('b', ('ARRAY(char, 8)', None))])
+
+    def test_sizeof_layout_attributes(self):
+        for text in (
+                'struct e { char a; int b; } __attribute__((__packed__));',
+                'struct e { char a; int b __attribute__((aligned(8))); };',
+                'typedef struct { char a; int b; } __attribute__((packed)) e_t;',
+                'typedef int e_t __attribute__((aligned(16)));',
+                '#pragma pack(push, 1)\nstruct e { char a; int b; };\n#pragma pack(pop)',
+                ):
+            buf = 'struct buf { char b[sizeof(%s)]; };' % (
+                    'e_t' if 'e_t' in text else 'struct e')
+            self.assertRaises(ImplementationError, analyze, text + '\n' + buf)
+
+    def test_casts(self):
+        analyzer = analyze('''
+            typedef unsigned int u32;
+            enum { U = (unsigned)-1, V = (const u32)-2, W = (signed char)255,
+                   X = (_Bool)5, Y = (unsigned short)65537 };
+            ''')
+        self.assertEqual(analyzer.objects['ENUM(!Unnamed1)'].members.items(),
+                [('U', 4294967295), ('V', 4294967294), ('W', -1),
+                 ('X', 1), ('Y', 1)])
+        for text in ('enum { P = (void *)0 };', 'enum { C = (char)1 };'):
+            self.assertRaises(ImplementationError, analyze, text)
+
+    def test_atomic(self):
+        for text in ('struct a { _Atomic int y; };',
+                'struct a { int * _Atomic p; };'):
+            self.assertRaises(ImplementationError, analyze, text)
+
+if __name__ == '__main__':
+    unittest.main()